@@ -7,12 +7,13 @@ import tempfile
 import shutil
 import datetime
 from io import open
-from xml.etree import cElementTree as ET
+from xml.etree import ElementTree as ET
 from ufonormalizer import (
     normalizeGLIF, normalizeGlyphsDirectoryNames, normalizeGlyphNames,
     subpathJoin, subpathSplit, subpathExists, subpathReadFile,
     subpathReadPlist, subpathWriteFile, subpathWritePlist, subpathRenameFile,
     subpathRemoveFile, subpathGetModTime, subpathNeedsRefresh, modTimeLibKey,
+    subpathListModTimes,
     storeModTimes, readModTimes, UFONormalizerError, XMLWriter, tobytes,
     userNameToFileName, handleClash1, handleClash2, xmlEscapeText,
     xmlEscapeAttribute, xmlConvertValue, xmlConvertFloat, xmlConvertInt,
@@ -26,9 +27,11 @@ from ufonormalizer import (
     _normalizeGlifPointAttributesFormat2,
     _normalizeGlifComponentAttributesFormat2, _normalizeGlifTransformation,
     _normalizeColorString, _convertPlistElementToObject, _normalizePlistFile,
-    main, xmlDeclaration, plistDocType, _decode_base64)
+    main, xmlDeclaration, plistDocType, _decode_base64, _cloneFile,
+    normalizePropertyList, _planRenames, normalizeGLIFString)
 from ufonormalizer import __version__ as ufonormalizerVersion
 
+import plistlib
 from plistlib import loads, dumps
 from io import StringIO
 from tempfile import TemporaryDirectory
@@ -263,6 +266,23 @@ class UFONormalizerTest(unittest.TestCase):
             self._test_normalizeGlyphsDirectoryNames(
                 oldLayers, expectedLayers))
 
+    def test_normalizeGlyphsDirectoryNames_swap(self):
+        oldLayers = [
+            ("public.default", "glyphs"),
+            ("one", "glyphs.two"),
+            ("two", "glyphs.one"),
+            ("Three", "glyphs.three")
+        ]
+        expectedLayers = [
+            ("public.default", "glyphs"),
+            ("one", "glyphs.one"),
+            ("two", "glyphs.two"),
+            ("Three", "glyphs.T_hree")
+        ]
+        self.assertTrue(
+            self._test_normalizeGlyphsDirectoryNames(
+                oldLayers, expectedLayers))
+
     def test_normalizeLayerInfoPlist_color(self):
         obj = dict(color="1,0,0,.5")
         _normalizeLayerInfoColor(obj)
@@ -296,6 +316,43 @@ class UFONormalizerTest(unittest.TestCase):
         self.assertTrue(
             self._test_normalizeGlyphNames(oldNames, expectedNames))
 
+    def test_normalizeGlyphNames_swap(self):
+        oldNames = {
+            "a": "b.glif",
+            "b": "a.glif",
+            "C": "c.glif"
+        }
+        expectedNames = {
+            "a": "a.glif",
+            "b": "b.glif",
+            "C": "C_.glif"
+        }
+        self.assertTrue(
+            self._test_normalizeGlyphNames(oldNames, expectedNames))
+
+    def test_normalizeGlyphNames_swap_next_to_case_variant(self):
+        oldNames = {
+            "a": "b.glif",
+            "b": "a.glif",
+            "A": "A.glif"
+        }
+        with TemporaryDirectory() as directory:
+            layerDirectory = "glyphs"
+            os.mkdir(os.path.join(directory, layerDirectory))
+            for glyphName, fileName in oldNames.items():
+                subpathWriteFile(glyphName, directory, layerDirectory, fileName)
+            if len(os.listdir(os.path.join(directory, layerDirectory))) != 3:
+                self.skipTest("case-insensitive file system")
+            subpathWritePlist(oldNames, directory, layerDirectory,
+                              "contents.plist")
+            newNames = normalizeGlyphNames(directory, layerDirectory)
+            self.assertEqual(
+                newNames, {"a": "a.glif", "b": "b.glif", "A": "A_.glif"})
+            for glyphName, fileName in newNames.items():
+                self.assertEqual(
+                    subpathReadFile(directory, layerDirectory, fileName),
+                    glyphName)
+
     def test_normalizeFontInfoPlist_guidelines(self):
         test = INFOPLIST_GUIDELINES
         expected = {
@@ -764,6 +821,15 @@ class UFONormalizerTest(unittest.TestCase):
         _normalizeGlifLib(element, writer)
         self.assertEqual(writer.getText(), '')
 
+    def test_normalizeGLIF_lib_invalid(self):
+        for lib in ("<lib><dict><key>a</key></dict></lib>",
+                    "<lib><dict><string>a</string></dict></lib>",
+                    "<lib><dict><key>a</key><key>b</key><true/></dict></lib>"):
+            element = ET.fromstring(lib)
+            writer = XMLWriter(declaration=None)
+            _normalizeGlifLib(element, writer)
+            self.assertEqual(writer.getText(), '')
+
     def test_normalizeGLIF_note_defined(self):
         """ Serialization of notes is non-fancy: we take the note text and
         use it, unchanged, as the body of the <note>element</note>. In previous
@@ -1278,6 +1344,56 @@ class UFONormalizerTest(unittest.TestCase):
         element = ET.fromstring(contour)
         self.assertIsNone(_normalizeGlifContourFormat2(element))
 
+    def test_normalizeGlif_contour_format2_invalid_point_with_identifier(self):
+        contour = '''
+        <contour>
+        <point type="line" y="0" x="a" identifier="test"/>
+        </contour>
+        '''
+        element = ET.fromstring(contour)
+        self.assertIsNone(_normalizeGlifContourFormat2(element))
+        self.assertIsNone(_normalizeGlifPointAttributesFormat2(element[0]))
+
+    def test_normalizeGlif_contour_format2_unknown_point_type_with_identifier(self):
+        contour = '''
+        <contour>
+        <point type="bogus" y="0" x="0" identifier="test"/>
+        </contour>
+        '''
+        element = ET.fromstring(contour)
+        self.assertEqual(
+            _normalizeGlifPointAttributesFormat2(element[0]),
+            {"identifier": "test"})
+        result = _normalizeGlifContourFormat2(element)
+        self.assertEqual(result["points"], [{"identifier": "test"}])
+        glif = '''<?xml version="1.0" encoding="UTF-8"?>
+<glyph name="a" format="2">
+	<outline>
+		<contour>
+			{}
+		</contour>
+	</outline>
+</glyph>
+'''
+        self.assertEqual(
+            normalizeGLIFString(glif.format(
+                '<point type="bogus" y="0" x="0" identifier="test"/>')),
+            glif.format('<point identifier="test"/>'))
+
+    def test_normalizeGLIFString_point_without_coordinates(self):
+        glif = '''<?xml version="1.0" encoding="UTF-8"?>
+<glyph name="a" format="2">
+	<outline>
+		<contour>
+			<point y="0" identifier="missing"/>
+			<point x="1" y="1" type="line"/>
+		</contour>
+	</outline>
+</glyph>
+'''
+        expected = glif.replace(' y="0" identifier', ' identifier')
+        self.assertEqual(normalizeGLIFString(glif), expected)
+
     def test_normalizeGlif_contour_format2_unknown_child_element(self):
         contour = '''
         <contour>
@@ -1372,6 +1488,16 @@ class UFONormalizerTest(unittest.TestCase):
         _normalizeColorString("1,2,1,1")
         _normalizeColorString(",,,")
 
+    def test_normalize_color_string_custom_precision(self):
+        import ufonormalizer
+        oldFloatFormat = ufonormalizer.FLOAT_FORMAT
+        self.assertEqual(_normalizeColorString("0.25,1,0,1"), '0.25,1,0,1')
+        ufonormalizer.FLOAT_FORMAT = "%.1f"
+        try:
+            self.assertEqual(_normalizeColorString("0.25,1,0,1"), '0.2,1,0,1')
+        finally:
+            ufonormalizer.FLOAT_FORMAT = oldFloatFormat
+
     def test_convert_plist_Element_to_object(self):
         element = ET.fromstring("<array></array>")
         self.assertEqual(_convertPlistElementToObject(element), [])
@@ -1400,6 +1526,21 @@ class UFONormalizerTest(unittest.TestCase):
         self.assertEqual(_convertPlistElementToObject(element), 1)
         element = ET.fromstring("<data>YWJj</data>")
         self.assertEqual(_convertPlistElementToObject(element), b'abc')
+        element = ET.fromstring("<integer>0x10</integer>")
+        self.assertEqual(_convertPlistElementToObject(element), 16)
+        element = ET.fromstring("<dict><key></key><string/></dict>")
+        self.assertEqual(_convertPlistElementToObject(element), {'': ''})
+
+    def test_convert_plist_Element_to_object_invalid(self):
+        for text in ("<dict><key>a</key><foo/></dict>",
+                     "<dict><key>a</key></dict>",
+                     "<dict><string>x</string></dict>",
+                     "<dict><key>a</key><key>b</key><string/></dict>",
+                     "<array><foo/></array>",
+                     "<integer/>"):
+            element = ET.fromstring(text)
+            with self.assertRaises(ValueError):
+                _convertPlistElementToObject(element)
 
     def test_main_verbose_or_quiet(self):
         stream = StringIO()
@@ -1533,6 +1674,33 @@ class UFONormalizerTest(unittest.TestCase):
             data = subpathReadPlist(outdir, "lib.plist")
             self.assertEqual(data["test_float"], 0.3333333333333334)
 
+    def test_main_jobs_argument(self):
+        metainfo = METAINFO_PLIST % 3
+        layercontents = dumps([["public.default", "glyphs"]]).decode("utf-8")
+        contents = dumps({"period": "period.glif",
+                          "A": "A_.glif"}).decode("utf-8")
+        with TemporaryDirectory(suffix=".ufo") as indir:
+            subpathWriteFile(metainfo, indir, "metainfo.plist")
+            subpathWriteFile(layercontents, indir, "layercontents.plist")
+            os.mkdir(os.path.join(indir, "glyphs"))
+            subpathWriteFile(contents, indir, "glyphs", "contents.plist")
+            subpathWriteFile(GLIFFORMAT2, indir, "glyphs", "period.glif")
+            subpathWriteFile(GLIFFORMAT2.replace("period", "A"),
+                             indir, "glyphs", "A_.glif")
+
+            serial = os.path.join(indir, "serial.ufo")
+            parallel = os.path.join(indir, "parallel.ufo")
+            main(["-o", serial, "-m", indir])
+            main(["-o", parallel, "-m", "-j", "2", indir])
+            for fileName in ("period.glif", "A_.glif"):
+                self.assertEqual(
+                    subpathReadFile(serial, "glyphs", fileName),
+                    subpathReadFile(parallel, "glyphs", fileName))
+
+            with self.assertRaisesRegex(SystemExit, '2'):
+                with redirect_stderr(StringIO()):
+                    main(["-j", "-1", indir])
+
     def test_normalizeLibPlistWithBytesData(self):
         metainfo = METAINFO_PLIST % 3
         libdata = """<?xml version="1.0" encoding="UTF-8"?>
@@ -1670,6 +1838,23 @@ class XMLWriterTest(unittest.TestCase):
         writer.propertyListObject(False)
         self.assertEqual(writer.getText(), '<false/>')
 
+    def test_propertyListObject_subclasses(self):
+        from collections import OrderedDict
+
+        class MyStr(str):
+            pass
+
+        writer = XMLWriter(declaration=None)
+        writer.propertyListObject(OrderedDict([("b", MyStr("x")), ("a", 1.0)]))
+        expected = "\n".join([
+            "<dict>",
+            "\t<key>a</key>",
+            "\t<integer>1</integer>",
+            "\t<key>b</key>",
+            "\t<string>x</string>",
+            "</dict>"])
+        self.assertEqual(writer.getText(), expected)
+
     def test_propertyListObject_float(self):
         writer = XMLWriter(declaration=None)
         writer.propertyListObject(1.1)
@@ -1814,6 +1999,9 @@ class XMLWriterTest(unittest.TestCase):
         self.assertEqual(xmlConvertFloat(1.00000000001), '1')
         self.assertEqual(xmlConvertFloat(1.00000000009), '1.0000000001')
         self.assertEqual(xmlConvertFloat(0.9999999999999999), '1')
+        self.assertEqual(xmlConvertFloat(-0.0), '0')
+        self.assertEqual(xmlConvertFloat(1e20), '100000000000000000000')
+        self.assertEqual(xmlConvertFloat(float("inf")), 'inf')
 
     def test_xmlConvertFloat_no_rounding(self):
         import ufonormalizer
@@ -1829,6 +2017,8 @@ class XMLWriterTest(unittest.TestCase):
     def test_xmlConvertFloat_custom_precision(self):
         import ufonormalizer
         oldFloatFormat = ufonormalizer.FLOAT_FORMAT
+        # a cached result for one precision must not leak into another
+        self.assertEqual(xmlConvertFloat(1.0001), '1.0001')
         ufonormalizer.FLOAT_FORMAT = "%.3f"
         self.assertEqual(xmlConvertFloat(1.001), '1.001')
         self.assertEqual(xmlConvertFloat(1.0001), '1')
@@ -1837,6 +2027,8 @@ class XMLWriterTest(unittest.TestCase):
         self.assertEqual(xmlConvertFloat(1.001), '1')
         self.assertEqual(xmlConvertFloat(1.9), '2')
         self.assertEqual(xmlConvertFloat(10.0), '10')
+        self.assertEqual(xmlConvertFloat(0.0), '0')
+        self.assertEqual(xmlConvertFloat(-0.0), '-0')
         ufonormalizer.FLOAT_FORMAT = oldFloatFormat
 
     def test_xmlConvertInt(self):
@@ -1905,6 +2097,12 @@ class SubpathTest(unittest.TestCase):
         self.createTestFile(text)
         self.assertEqual(text, subpathReadFile(self.directory, self.filename))
 
+    def test_subpathReadFile_newline(self):
+        with open(self.filepath, 'wb') as f:
+            f.write('foo\r\nbar\nbaz\rquz™'.encode('utf-8'))
+        self.assertEqual('foo\nbar\nbaz\nquz™',
+                         subpathReadFile(self.directory, self.filename))
+
     def test_subpathReadPlist(self):
         data = dict([('a', 'foo'), ('b', 'bar'), ('c', '™')])
         with open(self.plistpath, 'wb') as f:
@@ -1927,6 +2125,77 @@ class SubpathTest(unittest.TestCase):
             text = f.read()
         self.assertEqual(text, expected_text)
 
+    def test_subpathReadPlist_matches_plistlib(self):
+        data = {
+            'a': ['foo', 1, -2, 1.5, True, False],
+            'b': {'c': b'abc', 'd': datetime.datetime(2015, 7, 5, 22, 16, 18)},
+            'e': '',
+            '': {},
+        }
+        for fmt in (plistlib.FMT_XML, plistlib.FMT_BINARY):
+            with open(self.plistpath, 'wb') as f:
+                f.write(plistlib.dumps(data, fmt=fmt))
+            self.assertEqual(
+                subpathReadPlist(self.directory, self.plistname), data)
+
+    def test_subpathReadPlist_invalid_matches_plistlib(self):
+        template = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<plist version="1.0">%s</plist>')
+        bodies = [
+            '<dict><key>a</key><foo/></dict>',
+            '<dict><key>a</key></dict>',
+            '<dict><string>x</string></dict>',
+            '<dict><key>a</key><key>b</key><string/></dict>',
+            '<integer/>',
+            '<real/>',
+            '<dict><key>a',
+        ]
+        for body in bodies:
+            data = (template % body).encode("utf-8")
+            with open(self.plistpath, 'wb') as f:
+                f.write(data)
+            with self.assertRaises(Exception) as expected:
+                plistlib.loads(data)
+            with self.assertRaises(type(expected.exception)):
+                subpathReadPlist(self.directory, self.plistname)
+        # unknown elements in arrays are skipped, like plistlib does
+        data = (template % '<array><foo/><true/></array>').encode("utf-8")
+        with open(self.plistpath, 'wb') as f:
+            f.write(data)
+        self.assertEqual(subpathReadPlist(self.directory, self.plistname), [True])
+
+    def test_subpathReadPlist_entity_declaration(self):
+        with open(self.plistpath, 'wb') as f:
+            f.write(b'<?xml version="1.0"?>'
+                    b'<!DOCTYPE plist [<!ENTITY x "y">]>'
+                    b'<plist><string>&x;</string></plist>')
+        with self.assertRaises(plistlib.InvalidFileException):
+            subpathReadPlist(self.directory, self.plistname)
+
+    def test__normalizePlistFile_invalid_unchanged(self):
+        data = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<plist version="1.0"><dict><key>a</key><foo/></dict></plist>')
+        with open(self.plistpath, 'w', encoding='utf-8') as f:
+            f.write(data)
+        with self.assertRaises(ValueError):
+            _normalizePlistFile({}, self.directory, self.plistname)
+        with open(self.plistpath, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_subpathWriteFile_crlf_existing(self):
+        with open(self.filepath, 'wb') as f:
+            f.write(b'foo\r\nbar\r\n')
+        subpathWriteFile('foo\nbar\n', self.directory, self.filename)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), b'foo\nbar\n')
+
+    def test_subpathWriteFile_same_size_existing(self):
+        with open(self.filepath, 'wb') as f:
+            f.write(b'foo\n')
+        subpathWriteFile('bar\n', self.directory, self.filename)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), b'bar\n')
+
     def test_subpathWritePlist(self):
         expected_data = dict([('a', 'foo'), ('b', 'bar'), ('c', '™')])
         subpathWritePlist(expected_data, self.directory, self.plistname)
@@ -1934,6 +2203,24 @@ class SubpathTest(unittest.TestCase):
             data = loads(f.read())
         self.assertEqual(data, expected_data)
 
+    def test_subpathWritePlist_unchanged(self):
+        data = dict([('a', 'foo'), ('b', [1, 2.5])])
+        subpathWritePlist(data, self.directory, self.plistname)
+        os.utime(self.plistpath, (0, 0))
+        subpathWritePlist(dict(data), self.directory, self.plistname)
+        self.assertEqual(os.path.getmtime(self.plistpath), 0)
+        data['c'] = True
+        subpathWritePlist(data, self.directory, self.plistname)
+        self.assertNotEqual(os.path.getmtime(self.plistpath), 0)
+
+    def test_subpathWritePlist_equal_values_of_other_types(self):
+        subpathWritePlist({"flag": 1, "w": 2}, self.directory, self.plistname)
+        subpathWritePlist({"flag": True, "w": 2.0}, self.directory, self.plistname)
+        with open(self.plistpath, 'rb') as f:
+            data = loads(f.read())
+        self.assertIs(data["flag"], True)
+        self.assertIsInstance(data["w"], float)
+
     def test_subpathRenameFile(self):
         self.createTestFile('')
         subpathRenameFile(self.directory, self.filename, self.filename + "_")
@@ -1946,6 +2233,90 @@ class SubpathTest(unittest.TestCase):
         subpathRenameFile(self.directory, dirname, dirname + "_")
         self.assertTrue(os.path.exists(dirpath + "_"))
 
+    def test_cloneFile(self):
+        self.createTestFile('foo bar™⁜')
+        os.utime(self.filepath, (0, 0))
+        clonepath = self.filepath + "_"
+        _cloneFile(self.filepath, clonepath)
+        with open(clonepath, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'foo bar™⁜')
+        self.assertEqual(os.path.getmtime(clonepath), 0)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "FICLONE is Linux only")
+    def test_cloneFile_unsupported(self):
+        import errno
+        import ufonormalizer
+
+        calls = []
+
+        class FakeFcntl:
+            @staticmethod
+            def ioctl(fd, request, arg):
+                calls.append(request)
+                raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+        self.createTestFile('foo bar')
+        oldFcntl = ufonormalizer.fcntl
+        ufonormalizer.fcntl = FakeFcntl
+        try:
+            state = {}
+            for suffix in "_-":
+                clonepath = self.filepath + suffix
+                _cloneFile(self.filepath, clonepath, state=state)
+                with open(clonepath, 'r', encoding='utf-8') as f:
+                    self.assertEqual(f.read(), 'foo bar')
+        finally:
+            ufonormalizer.fcntl = oldFcntl
+        # the second copy doesn't try cloning again
+        self.assertEqual(len(calls), 1)
+
+    def test_planRenames(self):
+        # no collisions
+        self.assertEqual(
+            _planRenames([("a", "A_")], ["a", "b"]),
+            [("a", "A_")])
+        # chain
+        self.assertEqual(
+            _planRenames([("two", "one"), ("three", "two")],
+                         ["two", "three"]),
+            [("two", "one"), ("three", "two")])
+        # cycle
+        self.assertEqual(
+            _planRenames([("a", "b"), ("b", "a")], ["a", "b"]),
+            [("a", "org.unifiedfontobject.normalizer.0"),
+             ("b", "a"),
+             ("org.unifiedfontobject.normalizer.0", "b")])
+        # three element cycle next to a chain: one temp name in total
+        steps = _planRenames(
+            [("a", "b"), ("b", "c"), ("c", "a"), ("e", "d"), ("f", "e")],
+            ["a", "b", "c", "e", "f", "g"])
+        self.assertEqual(len(steps), 6)
+        temps = [toName for fromName, toName in steps
+                 if toName.startswith("org.unifiedfontobject.normalizer.")]
+        self.assertEqual(len(temps), 1)
+        names = {"a": "A", "b": "B", "c": "C", "e": "E", "f": "F", "g": "G"}
+        for fromName, toName in steps:
+            self.assertNotIn(toName, names)
+            names[toName] = names.pop(fromName)
+        self.assertEqual(
+            names,
+            {"b": "A", "c": "B", "a": "C", "d": "E", "e": "F", "g": "G"})
+        # case only
+        self.assertEqual(
+            _planRenames([("Ab", "ab")], ["Ab"]),
+            [("Ab", "org.unifiedfontobject.normalizer.0"),
+             ("org.unifiedfontobject.normalizer.0", "ab")])
+        # names differing only in case: moving one away doesn't free the other
+        names = {"a.glif": "a", "b.glif": "b", "A.glif": "A"}
+        steps = _planRenames(
+            [("b.glif", "a.glif"), ("a.glif", "b.glif"), ("A.glif", "A_.glif")],
+            list(names))
+        for fromName, toName in steps:
+            self.assertNotIn(toName, names)
+            names[toName] = names.pop(fromName)
+        self.assertEqual(
+            names, {"a.glif": "b", "b.glif": "a", "A_.glif": "A"})
+
     def test_subpathRemoveFile(self):
         self.createTestFile('')
         subpathRemoveFile(self.directory, self.filename)
@@ -1966,17 +2337,50 @@ class SubpathTest(unittest.TestCase):
         _normalizePlistFile({}, self.directory, "empty.plist", removeEmpty=False)
         self.assertTrue(os.path.exists(emptyPlist))
 
+    def test__normalizePlistFile_unchanged(self):
+        text = normalizePropertyList({"a": ["foo", 1.5]})
+        with open(self.plistpath, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.utime(self.plistpath, (0, 0))
+        _normalizePlistFile({}, self.directory, self.plistname)
+        self.assertEqual(os.path.getmtime(self.plistpath), 0)
+        with open(self.plistpath, "rb") as f:
+            self.assertEqual(f.read(), text.encode("utf-8"))
+
     def test_subpathGetModTime(self):
         self.createTestFile('')
         mtime = subpathGetModTime(self.directory, self.filename)
         self.assertEqual(os.path.getmtime(self.filepath), mtime)
 
+    def test_subpathListModTimes(self):
+        self.createTestFile('')
+        parent, directory = os.path.split(self.directory)
+        modTimes = subpathListModTimes(parent, directory)
+        self.assertEqual(modTimes[self.filename],
+                         os.path.getmtime(self.filepath))
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "needs symlinks")
+    def test_subpathListModTimes_dangling_symlink(self):
+        self.createTestFile('')
+        os.symlink(os.path.join(self.directory, "missing"),
+                   os.path.join(self.directory, "dangling"))
+        parent, directory = os.path.split(self.directory)
+        modTimes = subpathListModTimes(parent, directory)
+        self.assertEqual(list(modTimes), [self.filename])
+
     def test_subpathNeedsRefresh(self):
         import time
         self.createTestFile('')
         modTime = os.path.getmtime(self.filepath)
         modTimes = {}
         modTimes[self.filename] = float(modTime)
+        self.assertFalse(subpathNeedsRefresh(modTimes, self.directory,
+                         self.filename))
+        # mod times read back from the lib only have one decimal
+        os.utime(self.filepath, (1000000000.4321, 1000000000.4321))
+        modTimes = readModTimes({modTimeLibKey: "\n".join([
+            "version: %s" % ufonormalizerVersion,
+            "1000000000.4 %s" % self.filename])})
         self.assertFalse(subpathNeedsRefresh(modTimes, self.directory,
                          self.filename))
         time.sleep(1)  # to get a different modtime
@@ -2042,6 +2446,8 @@ class NameTranslationTest(unittest.TestCase):
         self.assertEqual(userNameToFileName("f_f_i"), "f_f_i")
         self.assertEqual(userNameToFileName("Aacute_V.swash"),
                          "A_acute_V_.swash")
+        self.assertEqual(userNameToFileName("\u00c9clair"), "\u00c9_clair")
+        self.assertEqual(userNameToFileName("a*B|c"), "a_B__c")
         self.assertEqual(userNameToFileName(".notdef"), "_notdef")
         self.assertEqual(userNameToFileName("con"), "_con")
         self.assertEqual(userNameToFileName("CON"), "C_O_N_")